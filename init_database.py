@@ -1,13 +1,25 @@
-from pymongo import MongoClient
 import pymysql
 from datetime import datetime
 
+import partitioning
+import vehicle_tracking
+
 
 def init_mongodb():
     """Initialize MongoDB with sample data"""
     try:
-        client = MongoClient('mongodb://localhost:27017/')
-        db = client['traffic_analytics']
+        shards = partitioning.connect_shards()
+        if shards is None:
+            raise RuntimeError("no MongoDB shard reachable")
+
+        for shard in shards.shards:
+            if not shard.reachable:
+                print(f"❌ Skipping unreachable shard {shard.name}")
+                continue
+            try:
+                vehicle_tracking.ensure_indexes(shard.db)
+            except Exception as e:
+                print(f"❌ Index creation failed on shard {shard.name}: {e}")
 
         # Create sample congestion data
         sample_congestion = {
@@ -19,10 +31,11 @@ def init_mongodb():
             "avg_speed": 15.5,
             "vehicle_count": 28,
             "cause": "volume",
+            "region": partitioning.DEFAULT_REGION,
             "resolved": False
         }
 
-        db.congestion_alerts.insert_one(sample_congestion)
+        shards.insert_one('congestion_alerts', sample_congestion)
         print("✅ MongoDB initialized with sample data")
 
     except Exception as e:
@@ -0,0 +1,167 @@
+import gzip
+import json
+import zlib
+from datetime import date, datetime
+from itertools import chain
+
+from bson import ObjectId
+from flask import current_app, request, stream_with_context
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent as-is; compressing them costs more than it saves
+COMPRESSION_THRESHOLD = 1024
+COMPRESSION_LEVEL = 5
+
+# Result sets with more documents than this are streamed instead of buffered
+STREAM_THRESHOLD = 500
+STREAM_BATCH_SIZE = 100
+
+
+def _default(obj):
+    """Encode types the JSON encoder does not handle natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj):
+    """Serialize obj straight to UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProvider(JSONProvider):
+    """JSON provider backed by orjson, with native ObjectId and datetime support"""
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is not None:
+            return orjson.loads(s)
+        return json.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def negotiate_encoding():
+    """Pick the best content encoding the client accepts, or None"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compressor(encoding):
+    """Return (compress, flush) callables for incremental compression"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=COMPRESSION_LEVEL)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+
+def compress_response(response):
+    """after_request hook: compress buffered responses above the size threshold"""
+    if (response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    body = response.get_data()
+    if len(body) < COMPRESSION_THRESHOLD:
+        return response
+
+    encoding = negotiate_encoding()
+    if encoding == 'br':
+        body = brotli.compress(body, quality=COMPRESSION_LEVEL)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=COMPRESSION_LEVEL)
+    else:
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def _iter_json_array(documents, head):
+    """Yield a JSON array as byte chunks of STREAM_BATCH_SIZE documents"""
+    yield b'['
+    batch = []
+    first = True
+    for doc in chain(head, documents):
+        batch.append(dumps_bytes(doc))
+        if len(batch) >= STREAM_BATCH_SIZE:
+            yield (b'' if first else b',') + b','.join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield (b'' if first else b',') + b','.join(batch)
+    yield b']'
+
+
+def json_array_response(documents):
+    """Serialize an iterable of documents as a JSON array response.
+
+    Small result sets are buffered and go through the normal response path.
+    Once more than STREAM_THRESHOLD documents are seen the rest is streamed
+    with chunked transfer encoding, compressed on the fly if the client accepts it.
+    """
+    documents = iter(documents)
+    head = []
+    for doc in documents:
+        head.append(doc)
+        if len(head) > STREAM_THRESHOLD:
+            break
+    else:
+        return current_app.json.response(head)
+
+    chunks = _iter_json_array(documents, head)
+    encoding = negotiate_encoding()
+    if encoding is not None:
+        chunks = _compress_chunks(chunks, encoding)
+
+    response = current_app.response_class(stream_with_context(chunks), mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def _compress_chunks(chunks, encoding):
+    compress, flush = _compressor(encoding)
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield flush()
+
+
+def init_app(app):
+    """Install the fast JSON provider and response compression on a Flask app"""
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
@@ -1,6 +1,17 @@
 import requests
 import json
 import time
+import gzip
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from flask import Flask, jsonify
+
+import partitioning
+import serialization
+import vehicle_tracking
 
 BASE_URL = "http://localhost:5000/api"
 
@@ -72,9 +83,263 @@ def test_traffic_endpoints():
         print(f"Error: {e}")
 
 
+def test_vehicle_endpoints():
+    """Test that an ingested ping shows up in the vehicle track and once on the live map"""
+    print("\n📍 Testing vehicle tracking endpoints...")
+
+    vehicle_id = f"V_SMOKE_{int(time.time() * 1000)}"
+    ping = {"vehicle_id": vehicle_id, "latitude": 40.751234, "longitude": -74.002345, "speed": 33.3}
+
+    try:
+        response = requests.post(f"{BASE_URL}/simulate-data", json=ping)
+        print(f"Simulate data: {response.status_code}")
+        if response.status_code != 201:
+            print(f"Response: {response.json()}")
+            return False
+
+        response = requests.get(f"{BASE_URL}/vehicles/{vehicle_id}/track")
+        print(f"Vehicle track: {response.status_code}")
+        if response.status_code != 200:
+            print(f"Response: {response.json()}")
+            return False
+        points = response.json()["points"]
+        if len(points) != 1 or (points[0]["latitude"], points[0]["longitude"]) != (ping["latitude"], ping["longitude"]):
+            print(f"❌ Expected the posted point in the track, got: {points}")
+            return False
+
+        response = requests.get(f"{BASE_URL}/congestion-map")
+        print(f"Congestion map: {response.status_code}")
+        if response.status_code != 200:
+            print(f"Response: {response.json()}")
+            return False
+        positions = [v for v in response.json()["vehicle_positions"] if v["vehicle_id"] == vehicle_id]
+        if len(positions) != 1:
+            print(f"❌ Expected the vehicle once on the map, found it {len(positions)} time(s)")
+            return False
+
+        print("✅ Vehicle endpoints OK")
+        return True
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
+class FakeTracks:
+    """Just enough of a pymongo collection for vehicle_tracking's track functions"""
+
+    def __init__(self):
+        self.chunks = {}
+
+    def update_one(self, query, update, upsert=False):
+        key = (query["vehicle_id"], query["chunk_start"])
+        chunk = self.chunks.setdefault(key, dict(query, points=[]))
+        chunk["points"].append(update["$push"]["points"])
+
+    def find(self, query):
+        bounds = query["chunk_start"]
+        matches = [chunk for (vehicle_id, start), chunk in self.chunks.items()
+                   if vehicle_id == query["vehicle_id"] and bounds["$gte"] <= start <= bounds["$lte"]]
+        return FakeCursor(matches)
+
+
+class FakeCursor(list):
+    def sort(self, key, direction):
+        return FakeCursor(sorted(self, key=lambda doc: doc[key], reverse=direction < 0))
+
+
+def test_vehicle_tracking_helpers():
+    """Test trajectory encoding, fleet merging and simplification without MongoDB"""
+    print("\n🛰️ Testing vehicle tracking helpers...")
+
+    class FakeDB:
+        vehicle_tracks = FakeTracks()
+
+    # 30 pings across two hourly chunks, written out of order
+    start = datetime(2026, 10, 19, 9, 50, 0, 123456)
+    pings = [{
+        "vehicle_id": "V0001",
+        "timestamp": (start + timedelta(seconds=37 * i, microseconds=i)).isoformat(),
+        "latitude": round(40.75 + 0.0001 * i, 6),
+        "longitude": round(-74.0 + 0.0001 * i, 6),
+        "speed": 30 + i
+    } for i in range(30)]
+    shuffled = pings[:]
+    random.Random(42).shuffle(shuffled)
+    db = FakeDB()
+    for ping in shuffled:
+        vehicle_tracking.append_to_track(db, ping)
+
+    assert len(db.vehicle_tracks.chunks) == 2
+    expected = [{k: p[k] for k in ("timestamp", "latitude", "longitude", "speed")} for p in pings]
+    track = vehicle_tracking.read_track(db, "V0001", start, start + timedelta(hours=2))
+    assert track == expected
+
+    # Timezone-aware bounds are compared in local time and keep the first chunk
+    aware_start = start.astimezone(timezone.utc)
+    aware_end = (start + timedelta(hours=2)).astimezone(timezone.utc)
+    assert vehicle_tracking.read_track(db, "V0001", aware_start, aware_end) == expected
+    window = datetime.fromisoformat(pings[5]["timestamp"]), datetime.fromisoformat(pings[9]["timestamp"])
+    assert vehicle_tracking.read_track(db, "V0001", *window) == expected[5:10]
+
+    # Each vehicle appears once on the map, at its newest position
+    fleet = vehicle_tracking.merge_fleets([
+        [{"vehicle_id": "V0001", "timestamp": "2026-10-19T10:00:00", "latitude": 1}],
+        [{"vehicle_id": "V0001", "timestamp": "2026-10-19T10:05:00", "latitude": 2},
+         {"vehicle_id": "V0002", "timestamp": "2026-10-19T10:01:00", "latitude": 3}],
+    ])
+    assert sorted((v["vehicle_id"], v["latitude"]) for v in fleet) == [("V0001", 2), ("V0002", 3)]
+
+    # A straight track collapses to its endpoints; a detour beyond the tolerance is kept
+    straight = [{"latitude": 40.75 + 0.001 * i, "longitude": -74.0} for i in range(10)]
+    assert vehicle_tracking.simplify(straight, 1) == [straight[0], straight[-1]]
+    detour = straight[:5] + [{"latitude": 40.755, "longitude": -73.99}] + straight[6:]
+    assert detour[5] in vehicle_tracking.simplify(detour, 10)
+    assert vehicle_tracking.simplify(detour, 0) == detour
+
+    print("✅ Vehicle tracking helpers OK")
+
+
+def test_compression_negotiation():
+    """Test JSON encoding and Accept-Encoding negotiation without a running server"""
+    print("\n🗜️ Testing response compression...")
+
+    app = Flask(__name__)
+    serialization.init_app(app)
+    docs = [{"_id": ObjectId(), "timestamp": datetime.now(), "speed": i} for i in range(50)]
+
+    @app.route('/small')
+    def small():
+        return jsonify({"status": "ok"})
+
+    @app.route('/docs/<int:count>')
+    def many(count):
+        return serialization.json_array_response(docs[i % len(docs)] for i in range(count))
+
+    client = app.test_client()
+
+    # Small bodies are not worth compressing
+    response = client.get('/small', headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json() == {"status": "ok"}
+
+    # ObjectId and datetime are encoded natively
+    response = client.get('/docs/50', headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    body = json.loads(gzip.decompress(response.data))
+    assert body[0]["_id"] == str(docs[0]["_id"])
+    assert body[0]["timestamp"] == docs[0]["timestamp"].isoformat()
+
+    # No Accept-Encoding means no compression
+    response = client.get('/docs/50')
+    assert "Content-Encoding" not in response.headers
+    assert len(response.get_json()) == 50
+
+    # Brotli is preferred when the client accepts it and the module is installed
+    response = client.get('/docs/50', headers={"Accept-Encoding": "gzip, br"})
+    expected = "br" if serialization.brotli is not None else "gzip"
+    assert response.headers["Content-Encoding"] == expected
+
+    # Large result sets are streamed and compressed on the fly
+    count = serialization.STREAM_THRESHOLD + 250
+    response = client.get(f'/docs/{count}', headers={"Accept-Encoding": "gzip"})
+    assert response.is_streamed
+    assert len(json.loads(gzip.decompress(response.data))) == count
+
+    print("✅ Compression negotiation OK")
+
+
+def test_shard_routing():
+    """Test shard placement and scatter-gather failure handling without MongoDB"""
+    print("\n🧩 Testing shard routing...")
+
+    def make_router(timeout=partitioning.SHARD_TIMEOUT):
+        # Shard.db is whatever client[database] returns, here just the shard name
+        return partitioning.ShardRouter([
+            partitioning.Shard("nyc-0", {"db": "nyc-0"}, "db", ["nyc"]),
+            partitioning.Shard("nyc-1", {"db": "nyc-1"}, "db", ["nyc"]),
+            partitioning.Shard("other", {"db": "other"}, "db", None),
+        ], timeout=timeout)
+
+    router = make_router()
+
+    # Regions map to their own shard group, case-insensitively; unknown regions use the default group
+    assert router.shard_for("NYC", "RD001").name in ("nyc-0", "nyc-1")
+    assert router.shard_for("nyc", "RD001").name == router.shard_for("NYC", "RD001").name
+    assert router.shard_for("boston", "RD001").name == "other"
+    assert router.shard_for(None, "RD001").name == "other"
+
+    # Placement is stable across routers (processes) and spreads roads over the group
+    other_router = make_router()
+    roads = [f"RD{i:03d}" for i in range(50)]
+    assert [router.shard_for("nyc", r).name for r in roads] == [other_router.shard_for("nyc", r).name for r in roads]
+    assert {router.shard_for("nyc", r).name for r in roads} == {"nyc-0", "nyc-1"}
+
+    # Vehicles are placed by id alone, regardless of region
+    assert router.shard_for_vehicle("V0001").name == other_router.shard_for_vehicle("V0001").name
+
+    # Slow or failing shards are reported as missing
+    router = make_router(timeout=0.2)
+
+    def slow_other(db):
+        if db == "other":
+            time.sleep(0.5)
+        return db
+
+    results, failed = router.scatter(slow_other)
+    assert sorted(results) == ["nyc-0", "nyc-1"]
+    assert failed == ["other"]
+    assert partitioning.partial_headers(failed) == {"X-Partial-Results": "other"}
+    assert partitioning.partial_headers([]) == {}
+
+    # No shard answering is an error, not an empty result
+    try:
+        router.scatter(lambda db: time.sleep(0.5))
+        assert False, "expected ShardsUnavailable"
+    except partitioning.ShardsUnavailable as e:
+        assert e.status == 504
+
+    try:
+        router.scatter(lambda db: 1 / 0)
+        assert False, "expected ShardsUnavailable"
+    except partitioning.ShardsUnavailable as e:
+        assert e.status == 503
+
+    # A slow shard under concurrent load must not starve the healthy one
+    router = partitioning.ShardRouter([
+        partitioning.Shard("a", {"db": "a"}, "db", None),
+        partitioning.Shard("b", {"db": "b"}, "db", None),
+    ], timeout=0.3, workers=4)
+
+    def slow_b(db):
+        if db == "b":
+            time.sleep(1)
+        return db
+
+    outcomes = []
+
+    def request():
+        try:
+            outcomes.append(router.scatter(slow_b))
+        except partitioning.ShardsUnavailable as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=request) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert outcomes == [(["a"], ["b"])] * 12
+
+    print("✅ Shard routing OK")
+
+
 if __name__ == "__main__":
     print("🚀 Starting Smart City Traffic Analytics Tests...")
 
+    # Offline checks first, so they run even when the services are down
+    test_compression_negotiation()
+    test_shard_routing()
+    test_vehicle_tracking_helpers()
+
     test_connections()
     time.sleep(1)
 
@@ -83,4 +348,5 @@ if __name__ == "__main__":
         test_login()
 
     test_traffic_endpoints()
+    test_vehicle_endpoints()
     print("\n🎉 Test completed!")
\ No newline at end of file
@@ -0,0 +1,192 @@
+import math
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+# Vehicles that have not reported for this long are left off the live map
+LIVE_WINDOW = timedelta(minutes=15)
+
+# Each trajectory document holds one vehicle's points for one hour
+CHUNK_SPAN = timedelta(hours=1)
+
+# Coordinates are stored as integer micro-degrees, matching the simulator's 6 decimal places
+COORD_SCALE = 1_000_000
+
+EARTH_RADIUS_M = 6_371_000
+
+STATE_FIELDS = ("latitude", "longitude", "speed", "road_id", "road_name", "vehicle_type", "region", "timestamp")
+
+
+def ensure_indexes(db):
+    """Create the indexes the vehicle_state and vehicle_tracks collections rely on"""
+    db.vehicle_state.create_index([("vehicle_id", ASCENDING)], unique=True)
+    db.vehicle_state.create_index([("timestamp", DESCENDING)])
+    db.vehicle_tracks.create_index([("vehicle_id", ASCENDING), ("chunk_start", ASCENDING)], unique=True)
+
+
+def chunk_start(ts):
+    """Start of the time chunk a timestamp falls into"""
+    epoch = datetime(1970, 1, 1, tzinfo=ts.tzinfo)
+    return ts - (ts - epoch) % CHUNK_SPAN
+
+
+def state_update(ping):
+    """Update pipeline that applies a ping to vehicle_state only if it is newer.
+
+    The timestamp check runs inside the update rather than in the filter, so a
+    late ping matches the existing document instead of upserting a duplicate,
+    whether or not the unique vehicle_id index exists.
+    """
+    is_newer = {"$lt": [{"$ifNull": ["$timestamp", ""]}, {"$literal": ping["timestamp"]}]}
+    return [{"$set": {
+        # $literal stops string values starting with "$" being read as field paths
+        field: {"$cond": [is_newer, {"$literal": ping.get(field)}, f"${field}"]}
+        for field in STATE_FIELDS
+    }}]
+
+
+def record_position(db, ping):
+    """Upsert a ping into vehicle_state and add it to the vehicle's trajectory.
+
+    Pings older than the stored state are late arrivals: they still go into the
+    trajectory but do not overwrite the last known position. Returns True if the
+    state was updated.
+    """
+    append_to_track(db, ping)
+
+    for attempt in range(2):
+        try:
+            result = db.vehicle_state.update_one(
+                {"vehicle_id": ping["vehicle_id"]}, state_update(ping), upsert=True)
+            return result.upserted_id is not None or result.modified_count > 0
+        except DuplicateKeyError:
+            # Lost a race to insert this vehicle's first state; the document exists now
+            if attempt:
+                raise
+
+
+def append_to_track(db, ping):
+    """Add a ping to the vehicle's trajectory chunk for its hour.
+
+    Each point is stored as [microseconds since chunk_start, latitude, longitude, speed]
+    with coordinates in integer micro-degrees. Points do not depend on each other,
+    so concurrent or out-of-order writes cannot corrupt a chunk.
+    """
+    ts = datetime.fromisoformat(ping["timestamp"])
+    start = chunk_start(ts)
+    point = [
+        (ts - start) // timedelta(microseconds=1),
+        round(ping["latitude"] * COORD_SCALE),
+        round(ping["longitude"] * COORD_SCALE),
+        ping.get("speed", 0)
+    ]
+
+    db.vehicle_tracks.update_one(
+        {"vehicle_id": ping["vehicle_id"], "chunk_start": start.isoformat()},
+        {
+            "$push": {"points": point},
+            "$max": {"end": ping["timestamp"]},
+            "$inc": {"count": 1}
+        },
+        upsert=True
+    )
+
+
+def to_naive_local(ts):
+    """Convert an aware datetime to naive local time, matching the stored timestamps"""
+    if ts.tzinfo is None:
+        return ts
+    return ts.astimezone().replace(tzinfo=None)
+
+
+def _iter_points(chunk):
+    """Yield (datetime, point) for each point of a trajectory chunk, oldest first"""
+    start = datetime.fromisoformat(chunk["chunk_start"])
+    for offset, lat, lon, speed in sorted(chunk["points"], key=lambda point: point[0]):
+        ts = start + timedelta(microseconds=offset)
+        yield ts, {
+            "timestamp": ts.isoformat(),
+            "latitude": lat / COORD_SCALE,
+            "longitude": lon / COORD_SCALE,
+            "speed": speed
+        }
+
+
+def decode_chunk(chunk):
+    """Expand a trajectory chunk back into absolute points, oldest first"""
+    return [point for _, point in _iter_points(chunk)]
+
+
+def read_track(db, vehicle_id, start, end, max_time_ms=None):
+    """Decoded points for one vehicle between two datetimes, oldest first"""
+    start, end = to_naive_local(start), to_naive_local(end)
+    chunks = db.vehicle_tracks.find({
+        "vehicle_id": vehicle_id,
+        "chunk_start": {"$gte": chunk_start(start).isoformat(), "$lte": end.isoformat()}
+    }).sort("chunk_start", ASCENDING)
+    if max_time_ms:
+        chunks = chunks.max_time_ms(max_time_ms)
+
+    return [point for chunk in chunks for ts, point in _iter_points(chunk) if start <= ts <= end]
+
+
+def live_fleet(db, now=None, max_time_ms=None):
+    """Last known position of every vehicle that reported within LIVE_WINDOW"""
+    since = ((now or datetime.now()) - LIVE_WINDOW).isoformat()
+    cursor = db.vehicle_state.find({"timestamp": {"$gte": since}}, {"_id": 0})
+    if max_time_ms:
+        cursor = cursor.max_time_ms(max_time_ms)
+    return list(cursor)
+
+
+def merge_fleets(fleets):
+    """Combine live_fleet results from several shards, keeping each vehicle's newest state"""
+    latest = {}
+    for fleet in fleets:
+        for vehicle in fleet:
+            current = latest.get(vehicle["vehicle_id"])
+            if current is None or vehicle["timestamp"] > current["timestamp"]:
+                latest[vehicle["vehicle_id"]] = vehicle
+    return list(latest.values())
+
+
+def _distance_to_segment(point, start, end):
+    """Approximate distance in metres from point to the segment start-end"""
+    lat0 = math.radians(start["latitude"])
+    scale = math.radians(1) * EARTH_RADIUS_M
+
+    def project(p):
+        return p["longitude"] * scale * math.cos(lat0), p["latitude"] * scale
+
+    px, py = project(point)
+    ax, ay = project(start)
+    bx, by = project(end)
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def simplify(points, tolerance):
+    """Douglas-Peucker simplification of a track with a tolerance in metres"""
+    if tolerance <= 0 or len(points) < 3:
+        return points
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        farthest, max_distance = None, tolerance
+        for i in range(first + 1, last):
+            distance = _distance_to_segment(points[i], points[first], points[last])
+            if distance > max_distance:
+                farthest, max_distance = i, distance
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+
+    return [point for point, kept in zip(points, keep) if kept]